@@ -1,17 +1,9 @@
 import os
-import sys
-import json
-import signal
-import asyncio
-from datetime import datetime
 
 from database import prompts, WorkersTable, save_userdata_to_json
-from models import UserData, ServiceType
+from models import UserData, ServiceType, SERVICE_VALUES_STR
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-from typing import Annotated, Optional, Literal
-from dataclasses import fields
+from typing import Annotated, Optional
 
 from dotenv import load_dotenv
 from pydantic import Field
@@ -19,10 +11,9 @@ from pydantic import Field
 from livekit.agents import (
     Agent,
     AgentSession,
-    AudioConfig,
-    BackgroundAudioPlayer,
     FunctionTool,
     JobContext,
+    JobProcess,
     RunContext,
     ToolError,
     WorkerOptions,
@@ -34,6 +25,12 @@ from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 load_dotenv(override=True)
 
+# Parallel tool calls let the LLM fill user info and query availabilities in a single turn.
+# Tools in one batch aren't ordered, so get_available_times reads the reason from the shared
+# UserData and, if it isn't set yet, tells the LLM to call it again once it is.
+# Set PARALLEL_TOOL_CALLS=false for LLMs that misbehave with parallel calls (e.g. some local OSS models).
+PARALLEL_TOOL_CALLS = os.getenv("PARALLEL_TOOL_CALLS", "true").lower() != "false"
+
 
 RunContext_T = RunContext[UserData]
 
@@ -44,15 +41,19 @@ class VoiceAgent(Agent):
         self.service_type = None
         self.userdata = None
         self.room_name = None
+        self._tool_cache: dict[ServiceType, FunctionTool] = {}
+        self._base_tools = (self.update_user_info, self.convince_user, self.update_reason_of_call, self.get_available_times, self.final_double_check, self.complete_conversation)
 
     @property
     def tools(self):
-        base_tools = [self.update_user_info, self.convince_user, self.update_reason_of_call, self.get_available_times, self.final_double_check, self.complete_conversation]
-        
-        if self.service_type:
-            base_tools.append(self.build_set_appointment_tool(self.service_type))
-        
-        return base_tools
+        if not self.service_type:
+            return list(self._base_tools)
+
+        tool = self._tool_cache.get(self.service_type)
+        if tool is None:
+            tool = self._tool_cache[self.service_type] = self.build_set_appointment_tool(self.service_type)
+
+        return [*self._base_tools, tool]
 
     @function_tool()
     async def update_user_info(
@@ -61,13 +62,11 @@ class VoiceAgent(Agent):
             number: Annotated[Optional[str], Field(description="The customer's phone number")] = None,
             address: Annotated[Optional[str], Field(description="The customer's address")] = None,
             postal_code: Annotated[Optional[str], Field(description="The customer's postal code")] = None,
+            reason: Annotated[Optional[str], Field(description=f"The reason for the call - must be one of: {SERVICE_VALUES_STR}")] = None,
             context: RunContext[UserData] = None,
     ) -> str:
-        f"""
-        Called when the user provides *any* of these contact details: {', '.join(f.name for f in fields(UserData))}.
-        Before calling this function, confirm the provided values with the user.
-        """
-        if not any([name, number, address, postal_code]):
+        """Called when the user provides any of their contact details or reason for the call."""
+        if not any([name, number, address, postal_code, reason]):
             return "No fields provided to update."
 
         userdata = context.userdata
@@ -89,80 +88,79 @@ class VoiceAgent(Agent):
             userdata.postal_code = postal_code
             updated.append(("postal code", postal_code))
 
-        return f'Updated: {', '.join(f"{label} to {value}" for label, value in updated) if updated else 'Nothing'}'
+        reason_result = self._apply_reason(userdata, reason) if reason is not None else ""
+        if not updated:
+            return reason_result
+
+        return f'Updated: {', '.join(f"{label} to {value}" for label, value in updated)}. {reason_result}'.rstrip()
 
     @function_tool()
     async def convince_user(
             self,
             context: RunContext[UserData] = None,
     ) -> str:
-        """
-        Called when the user refuses to provide ANY information.
-        MAKE SURE YOU GET THE INFORMATION.
-        """
+        """Called when the user refuses to provide ANY information."""
         return "All the information is needed to ensure our agents can reach you. Without the information, I can't set the appointment"
 
     @function_tool()
     async def update_reason_of_call(
             self,
-            reason: Annotated[str, Field(description="The reason for the call - must be one of: Plumbing, Pest Control, or Roofing Issues")],
+            reason: Annotated[str, Field(description=f"The reason for the call - must be one of: {SERVICE_VALUES_STR}")],
             context: RunContext[UserData],
     ) -> str:
-        f"""Called when the user provides their reason for the call.
-        Only accepts: {', '.join(service.value for service in ServiceType)}."""
-        userdata = context.userdata
+        """Called when the user gives only their reason for the call; use update_user_info if they also give contact details."""
+        return self._apply_reason(context.userdata, reason)
+
+    def _apply_reason(self, userdata: UserData, reason: str) -> str:
+        """Sets the reason for the call and returns the message for the LLM"""
         service_type = userdata.set_reason_of_call(reason)
-        if service_type:
-            self.service_type = service_type
-            return f"The reason for call is updated to {reason}. Now I can help you book an appointment. What time would you prefer?"
-        else:
-            return f"Invalid reason. Please choose one of: {', '.join([service.value for service in ServiceType])}"
+        if not service_type:
+            return f"Invalid reason. Please choose one of: {SERVICE_VALUES_STR}"
+
+        self.service_type = service_type
+        return f"The reason for call is updated to {reason}. Now I can help you book an appointment. What time would you prefer?"
 
     @function_tool()
     async def get_available_times(
             self,
             context: RunContext[UserData],
     ) -> str:
-        """
-        Called when the user has provided all the information and ready to set the time for the appointment.
-        """
-        if not self.service_type:
-            return f"Please first tell me what type of service you need {', '.join(i.value for i in ServiceType)} so I can show you available times."
+        """Called when the user is ready to pick a time for the appointment."""
+        reason = context.userdata.reason_of_call
+        if not reason:
+            return (f"The reason for the call isn't set yet. Call this again after the reason is updated, "
+                    f"or ask the user which service they need: {SERVICE_VALUES_STR}.")
 
-        available_times = WorkersTable.get_all_availabilities(self.service_type)
-        if not available_times:
-            return f"Sorry, there are no available appointments for {self.service_type.value} at the moment. Please try again later."
-        
-        time_strings = [f"{slot[0].strftime('%Y-%m-%d')} at {slot[1].strftime('%H:%M')}" for slot in available_times]
-        return f"Here are the available times for {self.service_type.value}: {', '.join(time_strings)}. Which time works best for you?"
+        service_type = ServiceType(reason)
+        time_strings = WorkersTable.get_all_availability_strings(service_type)
+        if not time_strings:
+            return f"Sorry, there are no available appointments for {service_type.value} at the moment. Please try again later."
+
+        return f"Here are the available times for {service_type.value}: {', '.join(time_strings)}. Which time works best for you?"
 
     @function_tool()
     async def final_double_check(
             self,
             context: RunContext[UserData],
     ) -> str:
-        f"""
-        Called at the end of the conversation to finalize the appointment and DOUBLE-CHECK the information with the user.
-        Repeat all the information received from the user and update anything that's wrong.
-        """
+        """Called at the end of the conversation to DOUBLE-CHECK all the information with the user."""
         userdata = context.userdata
         summary = userdata.summarize()
-        return f"Let me confirm the information I have: {[f'{k}: {v}' for k, v in summary.items()]}"
+        # Plain text rather than a list repr, so the LLM doesn't have to read past quotes and brackets
+        summary_text = ". ".join(f"{k}: {v}" for k, v in summary.items() if v)
+        return f"Let me confirm the information I have. {summary_text}. Please confirm everything is correct."
 
     @function_tool()
     async def complete_conversation(
             self,
             context: RunContext[UserData],
     ) -> str:
-        """
-        Called when the conversation is complete and all information has been collected.
-        This should be called after the appointment has been confirmed and the user is ready to end the call.
-        """
+        """Called after the user confirms all details, to save the appointment and end the call."""
         userdata = context.userdata
         self.userdata = userdata
         self.room_name = "console_session"
         
-        save_userdata_to_json(userdata, self.room_name)
+        await save_userdata_to_json(userdata, self.room_name)
         
         return "Thank you for your time! Your appointment has been confirmed and saved. Have a great day!"
 
@@ -173,8 +171,7 @@ class VoiceAgent(Agent):
         if not service_type:
             raise ToolError("Please specify the type of service you're looking for")
 
-        available_times = WorkersTable.get_all_availabilities(service_type)
-        available_time_strings = [f"{slot[0].strftime('%Y-%m-%d')} at {slot[1].strftime('%H:%M')}" for slot in available_times]
+        available_time_strings = list(WorkersTable.get_all_availability_strings(service_type))
 
         @function_tool
         async def set_appointment_time(
@@ -187,24 +184,12 @@ class VoiceAgent(Agent):
                 ),
             ],
         ) -> str:
-            """
-            Call this when the user selects an appointment time from the available slots.
-            The user must provide clear and specific input. For example, they might say:
-            - "I'd like to book for 2025-08-21 at 16:00"
-            - "Can I get the 10:00 slot on August 22nd?"
-            - "I'll take the 17:00 appointment"
-            """
-            selected_slot = None
-            for slot in available_times:
-                slot_string = f"{slot[0].strftime('%Y-%m-%d')} at {slot[1].strftime('%H:%M')}"
-                if slot_string == appointment_time:
-                    selected_slot = slot
-                    break
-            
+            """Called when the user selects one of the available appointment times."""
+            selected_slot = WorkersTable.find_slot(service_type, appointment_time)
             if not selected_slot:
                 raise ToolError(f"error: {appointment_time} was not found in available times.")
 
-            worker = WorkersTable.get_next_free_worker(selected_slot)
+            worker = WorkersTable.get_next_free_worker(service_type, selected_slot)
             if not worker:
                 raise ToolError(f"error: No worker available for {appointment_time}")
 
@@ -214,6 +199,12 @@ class VoiceAgent(Agent):
         return set_appointment_time
 
 
+def prewarm(proc: JobProcess):
+    # Load VAD once per worker process instead of on every call. The turn detector needs a job
+    # context, so it's built in entrypoint; its weights already load once in the inference executor.
+    proc.userdata["vad"] = silero.VAD.load()
+
+
 async def entrypoint(ctx: JobContext):
     await ctx.connect()
 
@@ -221,15 +212,16 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession[UserData](
         userdata=userdata,
         stt=deepgram.STT(model="nova-3"),
-        llm=openai.LLM(model="gpt-4o", parallel_tool_calls=False, temperature=0.45),
+        llm=openai.LLM(model="gpt-4o", parallel_tool_calls=PARALLEL_TOOL_CALLS, temperature=0.45),
         tts=cartesia.TTS(voice="f786b574-daa5-4673-aa0c-cbe3e8534c02", speed="fast"),
         turn_detection=MultilingualModel(),
-        vad=silero.VAD.load(),
+        vad=ctx.proc.userdata["vad"],
         max_tool_steps=10,
+        preemptive_generation=True,
     )
 
     await session.start(agent=VoiceAgent(), room=ctx.room)
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -3,18 +3,21 @@ Fake database class
 Ideally we'd have a SQL database here to get the data from a table properly
 """
 import json
+import atexit
+import asyncio
 from datetime import date, time, datetime
-from typing import Tuple, List
+from typing import Dict, Optional, Tuple
 
-from models import Worker, ServiceType, UserData
+from models import Worker, ServiceType, UserData, SERVICE_VALUES
 
 prompts = {
     'greetings':
         f"You're a respectful voice agent who receives calls from clients who want to set an appointment for one of your company's services.\n"
-        f"These services include {[e.value for e in ServiceType]}.\n"
+        f"These services include {list(SERVICE_VALUES)}.\n"
         f"Start by asking how you can help the client.\n"
         f"If client tries to ask irrelevant questions, kindly ask to report which one of the services he/she is looking for and lead the conversation.\n"
         f"After getting the service type, collect their contact information (name, phone, address, postal code) and then help them book an appointment time.\n"
+        f"Always confirm spelling and values with the user before calling any update tool.\n"
         f"Use the `get_available_times` tool to show available slots, then use the appointment booking tool to set the time.\n"
         f"Speak like a human, don't use phrases like \"Your information has been corrected\". Talk friendly.\n"
         f"When the user appears done OR asks to end, you MUST call the tool `final_double_check` to confirm all details. "
@@ -22,55 +25,101 @@ prompts = {
 }
 
 
-class WorkersTable:
-    @staticmethod
-    def _get_workers():
-        """Just a fake static DB of workers and their free time"""
-        masih = Worker(0, "Masih", [ServiceType.PLUMBING, ServiceType.PEST_CONTROL])
-        ali = Worker(1, "Ali", [ServiceType.PLUMBING, ServiceType.ROOFING_ISSUES])
+def _load_workers() -> Tuple[Worker, ...]:
+    """Just a fake static DB of workers and their free time"""
+    masih = Worker(0, "Masih", [ServiceType.PLUMBING, ServiceType.PEST_CONTROL])
+    ali = Worker(1, "Ali", [ServiceType.PLUMBING, ServiceType.ROOFING_ISSUES])
 
-        # Add times
-        masih.add_availability(date(2025, 8, 21), time(16, 0))
-        masih.add_availability(date(2025, 8, 21), time(17, 0))
-        masih.add_availability(date(2025, 8, 22), time(10, 0))
-        masih.add_availability(date(2025, 8, 22), time(12, 0))
+    # Add times
+    masih.add_availability(date(2025, 8, 21), time(16, 0))
+    masih.add_availability(date(2025, 8, 21), time(17, 0))
+    masih.add_availability(date(2025, 8, 22), time(10, 0))
+    masih.add_availability(date(2025, 8, 22), time(12, 0))
 
-        ali.add_availability(date(2025, 8, 22), time(12, 0))
-        ali.add_availability(date(2025, 8, 23), time(18, 0))
-        ali.add_availability(date(2025, 8, 23), time(11, 0))
+    ali.add_availability(date(2025, 8, 22), time(12, 0))
+    ali.add_availability(date(2025, 8, 23), time(18, 0))
+    ali.add_availability(date(2025, 8, 23), time(11, 0))
 
-        return [masih, ali]
+    return masih, ali
 
-    @staticmethod
-    def get_next_free_worker(appointment_time: Tuple) -> Worker:
-        """Returns the first next free worker for the specified time """
-        for worker in WorkersTable._get_workers():
-            if appointment_time in worker.get_availability():
-                return worker
 
-        return None
+# The table is static, so build it once at import instead of on every lookup
+_WORKERS = _load_workers()
+
+
+def _index_availabilities(workers: Tuple[Worker, ...]) -> Tuple[Dict, Dict]:
+    """Indexes the sorted free slots per skill and the workers free at each (skill, slot)"""
+    by_skill = {skill: set() for skill in ServiceType}
+    by_slot = {}
+    for worker in workers:
+        for slot in worker.get_availability():
+            for skill in worker.skills:
+                by_skill[skill].add(slot)
+                by_slot.setdefault((skill, slot), []).append(worker)
+
+    return {skill: tuple(sorted(slots)) for skill, slots in by_skill.items()}, by_slot
+
+
+_AVAIL_BY_SKILL, _WORKERS_BY_SLOT = _index_availabilities(_WORKERS)
+
+
+def format_slot(slot: Tuple) -> str:
+    """Formats a (date, time) slot the way it's spoken to and picked by the user"""
+    return f"{slot[0].strftime('%Y-%m-%d')} at {slot[1].strftime('%H:%M')}"
+
 
+# strftime is not cheap, so format every slot once instead of on each turn
+_AVAIL_STRINGS_BY_SKILL = {skill: tuple(format_slot(slot) for slot in slots) for skill, slots in _AVAIL_BY_SKILL.items()}
+_SLOT_BY_STRING = {skill: {format_slot(slot): slot for slot in slots} for skill, slots in _AVAIL_BY_SKILL.items()}
+
+
+class WorkersTable:
     @staticmethod
-    def get_all_availabilities(skill: ServiceType) -> List[Tuple]:
+    def get_next_free_worker(skill: ServiceType, appointment_time: Tuple) -> Worker:
+        """Returns the first next free worker with the given skill for the specified time """
+        return _WORKERS_BY_SLOT.get((skill, appointment_time), [None])[0]
+
+    @staticmethod
+    def get_all_availabilities(skill: ServiceType) -> Tuple[Tuple, ...]:
         """Returns all the available times for workers with the given skill."""
-        slots = {slot for w in WorkersTable._get_workers() if skill in w.skills for slot in w.get_availability()}
+        return _AVAIL_BY_SKILL.get(skill, ())
 
-        return sorted(slots, key=lambda s: (s[0], s[1]))
+    @staticmethod
+    def get_all_availability_strings(skill: ServiceType) -> Tuple[str, ...]:
+        """Returns the formatted available times for workers with the given skill."""
+        return _AVAIL_STRINGS_BY_SKILL.get(skill, ())
+
+    @staticmethod
+    def find_slot(skill: ServiceType, slot_string: str) -> Optional[Tuple]:
+        """Returns the available slot matching the formatted time, if any."""
+        return _SLOT_BY_STRING.get(skill, {}).get(slot_string)
 
 
 # Ideally, in a SQL file. Using jsonl for the simplicity as an example
-def save_userdata_to_json(userdata: UserData, room_name: str):
+# Opened on the first save and kept for the process lifetime, line-buffered so each appointment
+# hits the file right away
+_APPT_FH = None
+_APPT_LOCK = asyncio.Lock()
+
+
+async def save_userdata_to_json(userdata: UserData, room_name: str):
+    global _APPT_FH
     userdata_dict = userdata.summarize()
     userdata_dict["timestamp"] = datetime.now().isoformat()
     userdata_dict["room_name"] = room_name
-
-    with open("appointments.jsonl", "a", encoding="utf-8") as f:
-        f.write(json.dumps(userdata_dict, ensure_ascii=False) + "\n")
+    line = json.dumps(userdata_dict, ensure_ascii=False) + "\n"
+
+    # The write runs off the event loop so it can't stall the audio
+    async with _APPT_LOCK:
+        if _APPT_FH is None:
+            _APPT_FH = await asyncio.to_thread(open, "appointments.jsonl", "a", encoding="utf-8", buffering=1)
+            atexit.register(_APPT_FH.close)
+        await asyncio.to_thread(_APPT_FH.write, line)
     print("Appointment saved to appointments.jsonl")
 
 
 if __name__ == '__main__':
     a = WorkersTable.get_all_availabilities(ServiceType.PEST_CONTROL)
-    nw = WorkersTable.get_next_free_worker(a[0])
+    nw = WorkersTable.get_next_free_worker(ServiceType.PEST_CONTROL, a[0])
     print(f"Available times: {a}")
     print(f"Next worker: {nw.name if nw else 'None'}")
@@ -9,6 +9,11 @@ class ServiceType(Enum):
     ROOFING_ISSUES = "Roofing Issues"
 
 
+SERVICE_VALUES = tuple(service.value for service in ServiceType)
+SERVICE_VALUES_STR = ", ".join(SERVICE_VALUES)
+_SERVICE_BY_VALUE = {service.value: service for service in ServiceType}
+
+
 @dataclass
 class UserData:
     name: str = None
@@ -18,36 +23,43 @@ class UserData:
     reason_of_call: ServiceType = None
     appointment_time: str = None
 
+    # (attribute, summary key, default) triples; not annotated so it isn't picked up as a dataclass field
+    _SUMMARY_MAP = (
+        ("name", "customer_name", "unknown"),
+        ("phone_number", "customer_phone", "unknown"),
+        ("address", "address", None),
+        ("postal_code", "postal_code", None),
+        ("reason_of_call", "reason_of_call", None),
+        ("appointment_time", "appointment_time", None),
+    )
+
     def validate_reason_of_call(self, reason: str) -> bool:
-        return reason in [service.value for service in ServiceType]
+        return reason in _SERVICE_BY_VALUE
 
     def set_reason_of_call(self, reason: str) -> Optional[ServiceType]:
-        for service in ServiceType:
-            if service.value == reason:
-                self.reason_of_call = reason
-                return service
-        return None
+        service = _SERVICE_BY_VALUE.get(reason)
+        if service:
+            self.reason_of_call = reason
+        return service
 
     def summarize(self) -> Dict:
-        return {
-            "customer_name": self.name or "unknown",
-            "customer_phone": self.phone_number or "unknown",
-            "address": self.address,
-            "postal_code": self.postal_code,
-            "reason_of_call": self.reason_of_call,
-            "appointment_time": self.appointment_time
-        }
+        return {out: getattr(self, attr) or default for attr, out, default in self._SUMMARY_MAP}
 
 
 class Worker:
     def __init__(self, worker_id, name, skills):
         self.worker_id = worker_id
         self.name = name
-        self.skills = skills
-        self.availabilities = []
+        self.skills = frozenset(skills)
+        self._avail_set = set()
+        self._avail_sorted = None
 
     def add_availability(self, day, at):
-        self.availabilities.append((day, at))
+        self._avail_set.add((day, at))
+        self._avail_sorted = None
 
     def get_availability(self):
-        return self.availabilities
+        # Sorted lazily so loading the table stays linear
+        if self._avail_sorted is None:
+            self._avail_sorted = tuple(sorted(self._avail_set))
+        return self._avail_sorted